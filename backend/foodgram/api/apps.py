@@ -1,6 +1,27 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+        from recipes.models import (Favorite, Ingredient, Recipe,
+                                    ShoppingCart, Tag)
+        from users.models import Follow, User
+        from .authentication import token_deleted, user_changed
+        from .caching import model_changed
+        from .feed import recipe_changed, user_relation_changed
+
+        post_save.connect(recipe_changed, sender=Recipe)
+        post_delete.connect(recipe_changed, sender=Recipe)
+        for model in (Follow, Favorite, ShoppingCart):
+            post_save.connect(user_relation_changed, sender=model)
+            post_delete.connect(user_relation_changed, sender=model)
+        for model in (Recipe, Tag, Ingredient, User):
+            post_save.connect(model_changed, sender=model)
+            post_delete.connect(model_changed, sender=model)
+        post_delete.connect(token_deleted, sender=Token)
+        post_save.connect(user_changed, sender=User)
@@ -0,0 +1,132 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import parse_etags
+from rest_framework.exceptions import APIException
+
+from .authentication import CachedTokenAuthentication
+from .caching import response_key
+from .serializers import (IngredientSerializer, RecipeViewSerializer,
+                          TagSerializer)
+from .views import RecipeViewSet
+from recipes.cache import ingredients_cache, tags_cache
+from recipes.models import Recipe
+from recipes.search import autocomplete
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+NOT_FOUND = {'detail': 'Страница не найдена.'}
+
+recipe_view = RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+
+
+def json_response(data, status=200, headers=None):
+    return JsonResponse(data, status=status, safe=False, headers=headers,
+                        json_dumps_params={'ensure_ascii': False,
+                                           'separators': (',', ':')})
+
+
+def method_not_allowed(request):
+    return json_response(
+        {'detail': f'Метод "{request.method}" не разрешен.'}, status=405
+    )
+
+
+async def reference_list(request, reference, serializer_class, search=None):
+    """
+    Асинхронный список справочника с ETag, как в ReferenceDataMixin.
+    С параметром ?name= и функцией search отдаются подсказки.
+    """
+    if request.method not in SAFE_METHODS:
+        return method_not_allowed(request)
+    etag = f'"{await sync_to_async(reference.version)()}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    query = request.GET.get('name', '').strip() if search else ''
+    if query:
+        items = await sync_to_async(search)(query)
+    else:
+        items = list((await sync_to_async(reference.get)()).values())
+    return json_response(serializer_class(items, many=True).data,
+                         headers={'ETag': etag})
+
+
+async def reference_detail(request, id, reference, serializer_class):
+    if request.method not in SAFE_METHODS:
+        return method_not_allowed(request)
+    items = await sync_to_async(reference.get)()
+    if id not in items:
+        return json_response(NOT_FOUND, status=404)
+    return json_response(serializer_class(items[id]).data)
+
+
+async def tag_list(request):
+    return await reference_list(request, tags_cache, TagSerializer)
+
+
+async def tag_detail(request, id):
+    return await reference_detail(request, id, tags_cache, TagSerializer)
+
+
+async def ingredient_list(request):
+    return await reference_list(
+        request, ingredients_cache, IngredientSerializer, autocomplete
+    )
+
+
+async def ingredient_detail(request, id):
+    return await reference_detail(
+        request, id, ingredients_cache, IngredientSerializer
+    )
+
+
+def recipe_payload(request, id):
+    """
+    Синхронная часть чтения рецепта: токен, кэш ответов для анонимных
+    пользователей и запросы к базе. Возвращает статус и данные.
+    """
+    try:
+        credentials = CachedTokenAuthentication().authenticate(request)
+    except APIException as error:
+        return error.status_code, {'detail': error.detail}
+    request.user = credentials[0] if credentials else AnonymousUser()
+    key = None
+    if request.user.is_anonymous and settings.ANON_CACHE_TIMEOUT:
+        key = response_key(request, 'recipes')
+        cached = cache.get(key)
+        if cached is not None:
+            return 200, cached[0]
+    recipe = Recipe.objects.for_view(request.user).filter(id=id).first()
+    if recipe is None:
+        return 404, NOT_FOUND
+    data = RecipeViewSerializer(recipe, context={'request': request}).data
+    if key:
+        cache.set(key, (data, {}), settings.ANON_CACHE_TIMEOUT)
+    return 200, data
+
+
+async def recipe_detail(request, id):
+    """
+    Асинхронное чтение рецепта. Изменение и удаление
+    передаются обычному RecipeViewSet.
+    """
+    if request.method not in SAFE_METHODS:
+        return await sync_to_async(recipe_view)(request, id=id)
+    status, data = await sync_to_async(recipe_payload)(request, id)
+    return json_response(data, status=status)
+
+
+# Как и у DRF, проверка CSRF не нужна: используется аутентификация
+# по токену. Декоратор csrf_exempt обернул бы view в синхронную функцию.
+for view in (tag_list, tag_detail, ingredient_list, ingredient_detail,
+             recipe_detail):
+    view.csrf_exempt = True
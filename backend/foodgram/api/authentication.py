@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """
+    Двухуровневый кэш токенов: ограниченный LRU с временем жизни
+    в памяти процесса и кэш Django, общий для процессов.
+    Общий уровень не используется, если кэш Django локальный
+    для процесса: он не видел бы выхода в других процессах.
+    В общий кэш хэш пароля не попадает -- поле загружается
+    из базы при обращении к нему.
+    """
+
+    def __init__(self, size, local_timeout, timeout):
+        self.size = size
+        self.local_timeout = local_timeout
+        self.timeout = timeout
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def cache_key(key):
+        return f'auth-token:{sha256(key.encode()).hexdigest()}'
+
+    @staticmethod
+    def shared():
+        return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+    @staticmethod
+    def dump(credentials):
+        user, token = credentials
+        return {
+            'user': {
+                field.attname: getattr(user, field.attname)
+                for field in user._meta.concrete_fields
+                if field.attname != 'password'
+            },
+            'created': token.created,
+        }
+
+    @staticmethod
+    def restore(key, data):
+        fields = data['user']
+        user = get_user_model().from_db(
+            DEFAULT_DB_ALIAS, list(fields), list(fields.values())
+        )
+        token = Token(key=key, user=user, created=data['created'])
+        return user, token
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._items[key] = (monotonic() + self.local_timeout, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                if entry[0] > monotonic():
+                    self._items.move_to_end(key)
+                    return entry[1]
+                del self._items[key]
+        if not self.shared():
+            return None
+        data = cache.get(self.cache_key(key))
+        if data is None:
+            return None
+        value = self.restore(key, data)
+        self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        if self.shared():
+            cache.set(self.cache_key(key), self.dump(value), self.timeout)
+        self._remember(key, value)
+
+    def evict(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+        if self.shared():
+            cache.delete(self.cache_key(key))
+
+
+token_cache = TokenCache(
+    settings.AUTH_TOKEN_CACHE_SIZE,
+    settings.AUTH_TOKEN_LOCAL_TIMEOUT,
+    settings.AUTH_TOKEN_CACHE_TIMEOUT,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к базе для известных токенов."""
+
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+        return credentials
+
+
+def token_deleted(sender, instance, **kwargs):
+    """Токен удален, например при выходе -- убирается из кэша."""
+    token_cache.evict(instance.key)
+
+
+def user_changed(sender, instance, **kwargs):
+    """
+    Пользователь изменился, например сменил пароль или был
+    заблокирован -- его токены убираются из кэша.
+    """
+    for key in Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ):
+        token_cache.evict(key)
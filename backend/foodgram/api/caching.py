@@ -0,0 +1,74 @@
+from hashlib import md5
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.cache import ingredients_cache, tags_cache
+
+SCOPES = {
+    'recipes.recipe': ('recipes',),
+    'recipes.tag': ('recipes', 'tags'),
+    'recipes.ingredient': ('recipes', 'ingredients'),
+    'users.user': ('recipes',),
+}
+
+
+def generation_key(scope):
+    return f'anon-generation:{scope}'
+
+
+def generation(scope):
+    """Текущее поколение кэша ответов для анонимных пользователей."""
+    key = generation_key(scope)
+    value = cache.get(key)
+    if value is not None:
+        return value
+    cache.add(key, uuid4().hex, timeout=None)
+    return cache.get(key)
+
+
+def response_key(request, scope):
+    """
+    Ключ кэша ответа: поколение, путь и параметры запроса
+    в нормализованном виде -- отсортированные и без повторов.
+    """
+    params = urlencode(sorted(
+        (name, value)
+        for name in request.GET
+        for value in set(request.GET.getlist(name))
+    ))
+    digest = md5(f'{request.path}?{params}'.encode()).hexdigest()
+    return f'anon:{scope}:{generation(scope)}:{digest}'
+
+
+def card_keys(request, recipes):
+    """
+    Ключи кэша карточек рецептов. Карточка устаревает при изменении
+    рецепта, справочников тегов и ингредиентов или адреса сайта.
+    """
+    prefix = md5(
+        f'{request.build_absolute_uri("/")}:{tags_cache.version()}:'
+        f'{ingredients_cache.version()}'.encode()
+    ).hexdigest()
+    return {
+        recipe.id: f'card:{prefix}:{recipe.id}:{recipe.updated.timestamp()}'
+        for recipe in recipes
+    }
+
+
+def bump(*scopes):
+    cache.set_many(
+        {generation_key(scope): uuid4().hex for scope in scopes},
+        timeout=None
+    )
+
+
+def model_changed(sender, **kwargs):
+    """
+    Сбрасывает закэшированные ответы, в которые попадает модель,
+    после фиксации транзакции.
+    """
+    scopes = SCOPES[sender._meta.label_lower]
+    transaction.on_commit(lambda: bump(*scopes))
@@ -0,0 +1,38 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import Follow
+
+
+def version_key(user_id):
+    return f'feed-version:{user_id}'
+
+
+def head_page_key(user_id, limit):
+    """Ключ кэша первой страницы ленты пользователя."""
+    version = cache.get(version_key(user_id))
+    if version is None:
+        version = uuid4().hex
+        cache.add(version_key(user_id), version,
+                  timeout=settings.FEED_CACHE_TIMEOUT)
+    return f'feed:{user_id}:{version}:{limit}'
+
+
+def invalidate_feeds(user_ids):
+    """Сбрасывает закэшированные ленты пользователей."""
+    cache.delete_many([version_key(user_id) for user_id in user_ids])
+
+
+def recipe_changed(sender, instance, **kwargs):
+    """Рецепт автора изменился -- сбрасываются ленты его подписчиков."""
+    invalidate_feeds(
+        Follow.objects.filter(author_id=instance.author_id)
+        .values_list('user_id', flat=True)
+    )
+
+
+def user_relation_changed(sender, instance, **kwargs):
+    """Подписки, избранное или корзина пользователя изменились."""
+    invalidate_feeds([instance.user_id])
@@ -1,15 +1,46 @@
 import django_filters
+from django import forms
+from django.db.models import Exists, F, OuterRef
 from rest_framework import filters
 
+from recipes.cache import tags_cache
 from recipes.models import Recipe
+from recipes.search import search_recipes
+
+
+class MultipleValueField(forms.Field):
+    """Поле формы со списком значений без проверки по вариантам."""
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        return [item for item in value or () if item]
+
+
+class MultipleValueFilter(django_filters.Filter):
+    field_class = MultipleValueField
 
 
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = MultipleValueFilter(method='filter_tags')
     is_favorited = django_filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = django_filters.NumberFilter(
         method='filter_is_in_shopping_cart')
 
+    def filter_tags(self, queryset, name, slugs):
+        """
+        Рецепты хотя бы с одним из тегов. Слаги переводятся в id
+        по кэшу тегов, а условие задается через EXISTS, чтобы
+        рецепты не повторялись в выдаче.
+        """
+        tag_ids = {tag.slug: id for id, tag in tags_cache.get().items()}
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag_id__in=[tag_ids[slug] for slug in slugs
+                            if slug in tag_ids]
+            )
+        ))
+
     def filter_is_favorited(self, queryset, name, value):
         return (queryset.filter(favorite__user=self.request.user)
                 if value and not self.request.user.is_anonymous
@@ -25,5 +56,41 @@ class RecipeFilter(django_filters.FilterSet):
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
 
 
-class NameSearchFilter(filters.SearchFilter):
-    search_param = 'name'
+class RecipeSearchFilter(filters.BaseFilterBackend):
+    """Полнотекстовый поиск рецептов по ?search= с ранжированием."""
+    search_param = 'search'
+
+    @classmethod
+    def get_query(cls, request):
+        return request.query_params.get(cls.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_query(request)
+        return search_recipes(queryset, query) if query else queryset
+
+
+class RecipeOrderingFilter(filters.OrderingFilter):
+    """
+    Сортировка рецептов. Кроме полей модели поддерживает
+    ?ordering=popular -- по рейтингу популярности.
+    Применяется после поиска: явная сортировка заменяет
+    сортировку по релевантности, без нее релевантность сохраняется.
+    """
+    popular_ordering = (
+        F('popularity__score').desc(nulls_last=True), '-pub_date', '-id'
+    )
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if params == 'popular':
+            return self.popular_ordering
+        if params:
+            fields = self.remove_invalid_fields(
+                queryset, [param.strip() for param in params.split(',')],
+                view, request
+            )
+            if fields:
+                return fields
+        if RecipeSearchFilter.get_query(request):
+            return None
+        return self.get_default_ordering(view)
@@ -1,7 +1,15 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import parse_etags
 from rest_framework import mixins, status, viewsets
 from rest_framework.response import Response
 
+from .caching import response_key
 from recipes.models import Favorite, ShoppingCart
 from users.models import Follow
 
@@ -13,6 +21,69 @@ class UserViewSetMixin(viewsets.GenericViewSet,
     lookup_field = 'id'
 
 
+class AnonymousCacheMixin:
+    """
+    Кэширует данные ответов list и retrieve для анонимных пользователей.
+    Кэш сбрасывается сменой поколения области cache_scope.
+    """
+    cache_scope = None
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (request.user.is_authenticated
+                or not settings.ANON_CACHE_TIMEOUT
+                or 'If-None-Match' in request.headers):
+            return handler(request, *args, **kwargs)
+        key = response_key(request, self.cache_scope)
+        cached = cache.get(key)
+        if cached is not None:
+            data, headers = cached
+            return Response(data, headers=headers)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, (response.data, dict(response.items())),
+                      settings.ANON_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ReferenceDataMixin:
+    """
+    Отдает справочник из памяти процесса вместо запроса к базе.
+    Список помечается ETag по версии справочника и не передается
+    повторно, если клиент прислал ту же версию в If-None-Match.
+    """
+    reference = None
+
+    def get_reference_list(self):
+        return list(self.reference.get().values())
+
+    def list(self, request, *args, **kwargs):
+        etag = f'"{self.reference.version()}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+        serializer = self.get_serializer(self.get_reference_list(),
+                                         many=True)
+        return Response(serializer.data, headers={'ETag': etag})
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            instance = self.reference.get()[int(lookup)]
+        except (KeyError, ValueError):
+            raise Http404
+        return Response(self.get_serializer(instance).data)
+
+
 class AddDeleteMixin:
 
     handlers = {
@@ -29,6 +100,20 @@ class AddDeleteMixin:
             'Вы уже добавили этот рецепт в корзину',
         ]}
 
+    counters = {
+        'follow': 'followers_count',
+        'favorite': 'favorites_count',
+    }
+
+    def update_counter(self, id, handler, step):
+        """Атомарно меняет счетчик связей у объекта."""
+        counter = self.counters.get(handler)
+        if counter:
+            self.queryset.filter(id=id).update(
+                **{counter: Greatest(F(counter) + step, 0)}
+            )
+
+    @transaction.atomic
     def add_bound(self, id, handler, serializer):
         user = self.request.user
         bound = self.handlers[handler]
@@ -46,6 +131,7 @@ class AddDeleteMixin:
                 error,
                 status=status.HTTP_400_BAD_REQUEST
             )
+        self.update_counter(from_id.id, handler, 1)
         if 'many' in bound:
             serializer = serializer(
                 new_obj, context={'request': self.request}
@@ -54,6 +140,7 @@ class AddDeleteMixin:
             serializer = serializer(from_id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_bound(self, id, handler):
         bound = self.handlers[handler]
         create_obj = bound[0]
@@ -63,4 +150,5 @@ class AddDeleteMixin:
             create_obj, user=self.request.user,
             **as_key
         ).delete()
+        self.update_counter(from_id.id, handler, -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,9 +1,186 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Пагинатор Django, хранящий общее количество объектов в кэше
+    PAGE_COUNT_CACHE_TIMEOUT секунд. При нулевом значении считает заново.
+    """
+
+    @cached_property
+    def count(self):
+        timeout = settings.PAGE_COUNT_CACHE_TIMEOUT
+        if not timeout:
+            return super().count
+        query = str(self.object_list.query).encode()
+        return cache.get_or_set(
+            f'page-count:{md5(query).hexdigest()}',
+            lambda: Paginator.count.func(self),
+            timeout
+        )
+
+
+class KeysetPaginator(BasePagination):
+    """
+    Пагинация по ключу (курсору): следующая страница выбирается
+    условием на поля сортировки, а не OFFSET, и без COUNT(*).
+    Все поля сортировки должны быть по убыванию, последнее -- уникальным.
+    Другая сортировка запроса (?ordering=, ?search=) с курсором
+    несовместима и отклоняется с кодом 400.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 30
+    ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор'
+    invalid_ordering_message = (
+        'Пагинация по курсору поддерживает только сортировку по умолчанию'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        keyset_ordering = tuple(
+            getattr(view, 'keyset_ordering', self.ordering)
+        )
+        current = tuple(queryset.query.order_by)
+        if current != keyset_ordering[:len(current)]:
+            raise ParseError(self.invalid_ordering_message)
+        self.fields = [field.lstrip('-') for field in keyset_ordering]
+        values, reverse = self.decode_cursor(request)
+        ordering = [field if reverse else f'-{field}' for field in self.fields]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            values = self.parse_values(queryset.model, values)
+            queryset = queryset.filter(self.after(values, reverse))
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = values is not None
+        self.page = page
+        return page
+
+    def after(self, values, reverse):
+        """Условие «строго после курсора» для сортировки по убыванию."""
+        lookup = 'gt' if reverse else 'lt'
+        condition = Q()
+        for position, field in enumerate(self.fields):
+            condition |= Q(
+                **dict(zip(self.fields[:position], values[:position])),
+                **{f'{field}__{lookup}': values[position]}
+            )
+        return condition
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(cursor.encode()))
+            values, reverse = data['v'], data['r']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(reverse)
+
+    def parse_values(self, model, values):
+        """Приводит значения курсора к типам полей сортировки."""
+        try:
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in values:
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, obj, reverse):
+        data = json.dumps(
+            {'v': [getattr(obj, field) for field in self.fields],
+             'r': reverse},
+            default=lambda value: value.isoformat()
+        )
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            urlsafe_b64encode(data.encode()).decode()
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.encode_cursor(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
 
 
 class FoodgramPaginator(PageNumberPagination):
-    """Базовый пагинатор для сайта"""
+    """
+    Базовый пагинатор для сайта.
+    С параметром ?pagination=cursor (или ?cursor=) переключается
+    на пагинацию по ключу.
+    """
 
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 30
+    django_paginator_class = CachedCountPaginator
+    mode_query_param = 'pagination'
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or KeysetPaginator.cursor_query_param
+                in request.query_params):
+            self.keyset = KeysetPaginator()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,39 @@
+from threading import BoundedSemaphore
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework.exceptions import Throttled
+
+workers = BoundedSemaphore(settings.LOGIN_WORKERS)
+
+slots = BoundedSemaphore(settings.LOGIN_WORKERS + settings.LOGIN_QUEUE)
+
+
+def _verify(password, encoded):
+    rehashed = []
+    valid = check_password(
+        password, encoded,
+        setter=lambda raw: rehashed.append(make_password(raw))
+    )
+    return valid, rehashed[0] if rehashed else None
+
+
+def verify_password(user, password):
+    """
+    Проверяет пароль пользователя. Одновременно в процессе считается
+    не больше LOGIN_WORKERS хэшей, еще LOGIN_QUEUE запросов ждут
+    очереди, остальные отклоняются с кодом 429.
+    Хэш, созданный устаревшим алгоритмом, заменяется на новый.
+    """
+    if not slots.acquire(blocking=False):
+        raise Throttled(detail='Слишком много попыток входа, '
+                               'повторите позже.')
+    try:
+        with workers:
+            valid, encoded = _verify(password, user.password)
+    finally:
+        slots.release()
+    if encoded:
+        user.password = encoded
+        user.save(update_fields=['password'])
+    return valid
@@ -1,12 +1,65 @@
+from collections import Counter
+
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.validators import MaxLengthValidator, MinValueValidator
+from django.db import transaction
+from django.db.models import F, Manager
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.cache import ingredients_cache, tags_cache
+from recipes.images import discard_variants, schedule_variants
+from recipes.models import (CartIngredient, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
 from users.models import Follow, User
 from users.validators import validate_username
+from .caching import card_keys
+from .utils import get_recipes_limit
+
+
+class ReferencePrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """Связанный объект по id из справочника в памяти процесса."""
+
+    def __init__(self, reference, **kwargs):
+        self.reference = reference
+        kwargs.setdefault('queryset', reference.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            instance = self.reference.get().get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Ссылки на уменьшенные копии картинки рецепта.
+    Пока копия не готова, вместо нее отдается оригинал.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for variant in settings.IMAGE_VARIANTS:
+            name = recipe.image_variants.get(variant)
+            url = default_storage.url(name) if name else recipe.image.url
+            urls[variant] = (request.build_absolute_uri(url)
+                             if request else url)
+        return urls
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -26,6 +79,8 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, user):
         """Поле для обозначения подписки на пользователя."""
+        if hasattr(user, 'is_subscribed'):
+            return user.is_subscribed
         follower = self.context['request'].user
         return (
             not follower.is_anonymous
@@ -120,8 +175,7 @@ class RecipeIngredientViewSerializer(serializers.ModelSerializer):
 
 class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания промежуточной модели рецепта-ингредиента."""
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all(),
-                                            source='ingredient')
+    id = ReferencePrimaryKeyField(ingredients_cache, source='ingredient')
     amount = serializers.IntegerField(
         validators=[MinValueValidator(1, 'Количество должно быть больше нуля')]
     )
@@ -131,6 +185,42 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
+class RecipeCardListSerializer(serializers.ListSerializer):
+    """
+    Список рецептов из кэша карточек. В кэше хранится не зависящая
+    от пользователя часть карточки, флаги пользователя берутся
+    из аннотаций выборки for_cards.
+    """
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        request = self.context['request']
+        keys = card_keys(request, recipes)
+        cards = cache.get_many(list(keys.values()))
+        missing = [id for id, key in keys.items() if key not in cards]
+        if missing:
+            fresh = {
+                keys[recipe.id]: self.child.to_representation(recipe)
+                for recipe in Recipe.objects.for_view(request.user)
+                .filter(id__in=missing)
+            }
+            cache.set_many(fresh, settings.RECIPE_CARD_CACHE_TIMEOUT)
+            cards.update(fresh)
+        return [
+            self.with_user_flags(cards[keys[recipe.id]], recipe)
+            for recipe in recipes if keys[recipe.id] in cards
+        ]
+
+    @staticmethod
+    def with_user_flags(card, recipe):
+        card = card.copy()
+        card['author'] = card['author'].copy()
+        card['author']['is_subscribed'] = recipe.is_subscribed
+        card['is_favorited'] = recipe.is_favorited
+        card['is_in_shopping_cart'] = recipe.is_in_shopping_cart
+        return card
+
+
 class RecipeViewSerializer(serializers.ModelSerializer):
     """Общий сериализатор для модели рецепта."""
     tags = TagSerializer(many=True)
@@ -139,53 +229,36 @@ class RecipeViewSerializer(serializers.ModelSerializer):
         many=True,
         source='recipe_ingredient'
     )
-    is_favorited = serializers.SerializerMethodField(
-        method_name='get_is_favorited'
-    )
-    is_in_shopping_cart = serializers.SerializerMethodField(
-        method_name='get_is_in_shopping_cart'
+    is_favorited = serializers.BooleanField(read_only=True, default=False)
+    is_in_shopping_cart = serializers.BooleanField(
+        read_only=True, default=False
     )
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
-        )
-
-    def get_is_favorited(self, recipe):
-        """Поле для обозначения нахождения рецепта в избранном."""
-        user = self.context['request'].user
-        return (
-            not user.is_anonymous
-            and recipe.favorite.filter(user=user).exists()
+            'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
+            'cooking_time'
         )
-
-    def get_is_in_shopping_cart(self, recipe):
-        """Поле для обозначения нахождения рецепта в корзине."""
-        user = self.context['request'].user
-        return (
-            not user.is_anonymous
-            and recipe.cart.filter(user=user, recipe=recipe.id).exists()
-            )
+        list_serializer_class = RecipeCardListSerializer
 
 
 class ShortRecipe(serializers.ModelSerializer):
     """Сокращенный сериализатор для рецепта."""
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания модели рецепта."""
     author = UserSerializer(read_only=True)
     image = Base64ImageField()
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
+    tags = ReferencePrimaryKeyField(tags_cache, many=True)
     ingredients = RecipeIngredientCreateSerializer(
         many=True, source='recipe_ingredient'
     )
@@ -215,24 +288,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'ingredients должны быть заданы'
             )
-        unknown_ingredients = [
-            ingredient.get('ingredient').id
-            for ingredient in ingredients
-            if not Ingredient.objects.filter(
-                id=ingredient.get('ingredient').id).exists()
-        ]
-        if unknown_ingredients:
-            raise serializers.ValidationError(
-                f'ingredients с таким id нет: {unknown_ingredients}'
-            )
-        ingredient_ids = [
-            ingredient.get('ingredient').id
-            for ingredient in ingredients
-        ]
+        ingredient_ids = Counter(
+            ingredient.get('ingredient').id for ingredient in ingredients
+        )
         repeat_ingredients = [
-            ingredient.get('ingredient').id
-            for ingredient in ingredients
-            if ingredient_ids.count(ingredient.get('ingredient').id) > 1
+            id for id, count in ingredient_ids.items() if count > 1
         ]
         if repeat_ingredients:
             raise serializers.ValidationError(
@@ -249,14 +309,6 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Tag(-и) должны быть заданы'
             )
-        unknown_tags = [
-            tag.id for tag in tags
-            if not Tag.objects.filter(id=tag.id).exists()
-        ]
-        if unknown_tags:
-            raise serializers.ValidationError(
-                f'Tag(-ов) с таким id нет: {unknown_tags}'
-            )
         return tags
 
     @staticmethod
@@ -272,26 +324,77 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             ) for ingredient in ingredients]
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipe_ingredient')
-        recipe = Recipe.objects.create(
-            author=self.context['request'].user,
-            **validated_data
+        author = self.context['request'].user
+        recipe = Recipe.objects.create(author=author, **validated_data)
+        User.objects.filter(id=author.id).update(
+            recipes_count=F('recipes_count') + 1
         )
         self.create_ingredients(recipe, ingredients)
         recipe.tags.set(tags)
+        schedule_variants(recipe)
         return recipe
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        """
+        Приводит ингредиенты рецепта к переданным, изменяя только
+        отличающиеся строки. Возвращает True, если что-то изменилось.
+        """
+        amounts = {
+            ingredient.get('ingredient').id: ingredient.get('amount')
+            for ingredient in ingredients
+        }
+        stored = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredient.all()
+        }
+        removed = [
+            recipe_ingredient.id
+            for ingredient_id, recipe_ingredient in stored.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            recipe_ingredient = stored.get(ingredient_id)
+            if recipe_ingredient and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        added = [
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in sorted(amounts.items())
+            if ingredient_id not in stored
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        return bool(removed or changed or added)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         if validated_data.get('tags'):
-            instance.tags.clear()
             instance.tags.set(validated_data.pop('tags'))
         if validated_data.get('recipe_ingredient'):
-            RecipeIngredient.objects.filter(recipe=instance).delete()
             ingredients = validated_data.pop('recipe_ingredient')
-            self.create_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+            if self.update_ingredients(instance, ingredients):
+                CartIngredient.objects.rebuild(
+                    instance.cart.values('user')
+                )
+        if 'image' in validated_data:
+            discard_variants(instance.image_variants)
+            validated_data['image_variants'] = {}
+        recipe = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            schedule_variants(recipe)
+        return recipe
 
     def to_representation(self, instance):
         return ShortRecipe(
@@ -330,19 +433,19 @@ class FollowSerializer(serializers.ModelSerializer):
 
     def get_recipes_count(self, follower):
         """Поле для обозначения общего количества рецептов пользователя."""
-        return follower.author.recipes.count()
+        return follower.author.recipes_count
 
     def get_recipes(self, follower):
         """Поле сериализатора с ограниччением количества рецептов
         и их коротким представлением"""
-        request = self.context.get('request')
-        recipes_limit = (int(request.query_params.get('recipes_limit'))
-                         if request.query_params.get('recipes_limit')
-                         else None)
-        recipes = (Recipe.objects.filter(author=follower.author)
-                   if not recipes_limit
-                   else Recipe.objects.filter(author=follower.author)
-                   [:recipes_limit])
+        recipes = self.context.get('recipes')
+        if recipes is not None:
+            recipes = recipes.get(follower.author_id, [])
+        else:
+            recipes = Recipe.objects.latest_by_authors(
+                [follower.author_id],
+                get_recipes_limit(self.context.get('request'))
+            )
         serializer = ShortRecipe(
             recipes, many=True, read_only=True,
             context={'request': self.context.get('request')}
@@ -0,0 +1,185 @@
+from threading import Event, Thread
+from time import sleep
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api import passwords
+from recipes.models import CartIngredient, Ingredient, RecipeIngredient, Tag
+from users.models import User
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+    'AAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+
+class RecipeApiTests(TestCase):
+    """Проверки числа запросов и поведения API рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@foodgram.ru', password='password',
+            first_name='Повар', last_name='Поваров'
+        )
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#006400', slug='breakfast'
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(20)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, ingredients, name='Рецепт'):
+        response = self.client.post('/api/recipes/', {
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': IMAGE,
+            'tags': [self.tag.id],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in ingredients
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def test_create_queries_do_not_grow_with_ingredients(self):
+        # Справочники тегов и ингредиентов загружаются первым запросом.
+        self.create_recipe([(self.ingredients[0], 1)], name='Прогрев')
+        # На PostgreSQL добавляется обновление поискового вектора.
+        expected = 9 if connection.vendor == 'postgresql' else 8
+        for count in (1, 5, 20):
+            with CaptureQueriesContext(connection) as context:
+                self.create_recipe(
+                    [(ingredient, 1)
+                     for ingredient in self.ingredients[:count]],
+                    name=f'Рецепт {count}'
+                )
+            self.assertEqual(len(context), expected, count)
+
+    def test_update_keeps_unchanged_ingredient_rows(self):
+        kept, changed, removed, added = self.ingredients[:4]
+        recipe_id = self.create_recipe([(kept, 1), (changed, 2), (removed, 3)])
+        before = dict(RecipeIngredient.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', 'id'))
+        response = self.client.patch(f'/api/recipes/{recipe_id}/', {
+            'ingredients': [
+                {'id': kept.id, 'amount': 1},
+                {'id': changed.id, 'amount': 5},
+                {'id': added.id, 'amount': 4},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        after = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe_id=recipe_id)
+        }
+        self.assertEqual(set(after), {kept.id, changed.id, added.id})
+        self.assertEqual(after[kept.id].id, before[kept.id])
+        self.assertEqual(after[changed.id].id, before[changed.id])
+        self.assertEqual(after[changed.id].amount, 5)
+        self.assertEqual(after[added.id].amount, 4)
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        for number in range(6):
+            self.create_recipe(
+                [(ingredient, 1)
+                 for ingredient in self.ingredients[number:number + 3]],
+                name=f'Рецепт {number}'
+            )
+        counts = []
+        for limit in (3, 6):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(len(response.json()['results']), limit)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_update_rebuilds_totals_of_carts_with_recipe(self):
+        salt, pepper = self.ingredients[:2]
+        recipe_id = self.create_recipe([(salt, 3), (pepper, 1)])
+        other_id = self.create_recipe([(salt, 2)], name='Другой рецепт')
+        buyers = [
+            User.objects.create_user(
+                username=f'buyer{number}', email=f'buyer{number}@foodgram.ru',
+                password='password', first_name='Покупатель',
+                last_name='Покупателев'
+            )
+            for number in range(2)
+        ]
+        for buyer in buyers:
+            client = APIClient()
+            client.force_authenticate(buyer)
+            for id in (recipe_id, other_id):
+                response = client.post(f'/api/recipes/{id}/shopping_cart/')
+                self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.patch(f'/api/recipes/{recipe_id}/', {
+            'ingredients': [
+                {'id': salt.id, 'amount': 4},
+                {'id': pepper.id, 'amount': 1},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        for buyer in buyers:
+            totals = dict(CartIngredient.objects.filter(
+                user=buyer).values_list('ingredient_id', 'amount'))
+            self.assertEqual(totals, {salt.id: 6, pepper.id: 1})
+
+
+class LoginLimitTests(TestCase):
+    """Проверки ограничения одновременных входов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='guest', email='guest@foodgram.ru', password='password',
+            first_name='Гость', last_name='Гостев'
+        )
+
+    def test_login_is_throttled_when_pool_is_full(self):
+        release = Event()
+
+        def check_password(password, encoded, setter=None):
+            release.wait(5)
+            return True
+
+        user = SimpleNamespace(password='hash')
+        threads = [
+            Thread(target=passwords.verify_password, args=(user, 'password'))
+            for _ in range(settings.LOGIN_WORKERS + settings.LOGIN_QUEUE)
+        ]
+        with mock.patch.object(passwords, 'check_password', check_password):
+            for thread in threads:
+                thread.start()
+            try:
+                while passwords.slots._value:
+                    sleep(0.01)
+                response = APIClient().post('/api/auth/token/login/', {
+                    'email': 'guest@foodgram.ru', 'password': 'password'
+                })
+            finally:
+                release.set()
+                for thread in threads:
+                    thread.join()
+        self.assertEqual(response.status_code, 429, response.content)
+        response = APIClient().post('/api/auth/token/login/', {
+            'email': 'guest@foodgram.ru', 'password': 'password'
+        })
+        self.assertEqual(response.status_code, 201, response.content)
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import (IngredientsViewSet, RecipeViewSet, TagViewSet, UserViewSet,
                     login, logout)
 
@@ -20,3 +22,14 @@ urlpatterns = [
     path('', include(router_v1.urls), name='foodgram-api'),
     path('auth/token/', include(extra_patterns), name='auth')
 ]
+
+async_patterns = [
+    path('tags/', async_views.tag_list),
+    path('tags/<int:id>/', async_views.tag_detail),
+    path('ingredients/', async_views.ingredient_list),
+    path('ingredients/<int:id>/', async_views.ingredient_detail),
+    path('recipes/<int:id>/', async_views.recipe_detail),
+]
+
+if settings.SERVER_MODE == 'asgi':
+    urlpatterns = async_patterns + urlpatterns
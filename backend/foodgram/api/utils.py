@@ -1,16 +1,102 @@
-from django.http import HttpResponse
+import csv
 
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
 
-def text_cart(querryset):
-    content = '\n'.join([
-        (f'{ol}. {ingredient["ingredient__name"]} '
-         f'{ingredient["amount"]} '
-         f'{ingredient["ingredient__measurement_unit"]}'
-         ) for ol, ingredient in enumerate(list(querryset), start=1)
-    ])
-    response = HttpResponse(content, content_type='text/plain')
-    response['Content-Disposition'] = (
-            'attachment;'
-            ' filename=shopping-list.txt'
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def text_cart(cart):
+    """Построчно отдает список покупок в текстовом виде."""
+    for ol, ingredient in enumerate(cart, start=1):
+        yield (f'{ol}. {ingredient["ingredient__name"]} '
+               f'{ingredient["amount"]} '
+               f'{ingredient["ingredient__measurement_unit"]}\n')
+
+
+def csv_cart(cart):
+    """Построчно отдает список покупок в формате csv."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for ingredient in cart:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['amount'],
+            ingredient['ingredient__measurement_unit'],
+        ))
+
+
+CART_FORMATS = {
+    'txt': (text_cart, 'text/plain; charset=utf-8'),
+    'csv': (csv_cart, 'text/csv; charset=utf-8'),
+}
+
+
+def stream_cart(querryset, cart_format='txt'):
+    """
+    Отдает список покупок потоком, читая агрегат курсором на сервере,
+    так что документ целиком не собирается в памяти.
+    """
+    if cart_format not in CART_FORMATS:
+        raise ValidationError(
+            {'format': f'Доступные форматы: {", ".join(CART_FORMATS)}'}
         )
+    lines, content_type = CART_FORMATS[cart_format]
+    response = StreamingHttpResponse(
+        lines(querryset.iterator()), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        'attachment;'
+        f' filename=shopping-list.{cart_format}'
+    )
     return response
+
+
+class IgnoreFormatNegotiation(DefaultContentNegotiation):
+    """
+    Не использует параметр ?format= для выбора рендерера:
+    в выгрузке списка покупок он задает формат файла.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def get_positive_int(request, param):
+    """Проверяет, что параметр запроса -- положительное целое число."""
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    if not value.isdigit() or int(value) < 1:
+        raise ValidationError(
+            {param: 'Должно быть положительным целым числом'}
+        )
+    return int(value)
+
+
+def get_recipes_limit(request):
+    """Проверяет параметр recipes_limit запроса."""
+    return get_positive_int(request, 'recipes_limit')
+
+
+def get_ingredient_ids(request):
+    """
+    Проверяет параметр ingredients запроса: id ингредиентов
+    через запятую или повтором параметра.
+    """
+    values = [
+        value
+        for param in request.query_params.getlist('ingredients')
+        for value in param.split(',') if value
+    ]
+    if not values or not all(value.isdigit() for value in values):
+        raise ValidationError(
+            {'ingredients': 'Укажите id ингредиентов целыми числами'}
+        )
+    return {int(value) for value in values}
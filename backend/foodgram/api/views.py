@@ -1,5 +1,11 @@
+from collections import defaultdict
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, permissions, status, viewsets
@@ -7,17 +13,23 @@ from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 
-from .filters import NameSearchFilter, RecipeFilter
-from .mixins import AddDeleteMixin, UserViewSetMixin
-from .paginators import FoodgramPaginator
+from .feed import head_page_key
+from .filters import RecipeFilter, RecipeOrderingFilter, RecipeSearchFilter
+from .mixins import (AddDeleteMixin, AnonymousCacheMixin, ReferenceDataMixin,
+                     UserViewSetMixin)
+from .paginators import FoodgramPaginator, KeysetPaginator
+from .passwords import verify_password
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (ChangePassword, FollowSerializer,
                           IngredientSerializer, Login, RecipeCreateSerializer,
                           RecipeViewSerializer, TagSerializer,
                           UserCreateSerializer, UserSerializer, ShortRecipe)
-from .utils import text_cart
-from recipes.models import (Ingredient, Recipe, RecipeIngredient,
-                            Tag)
+from .utils import (IgnoreFormatNegotiation, get_ingredient_ids,
+                    get_positive_int, get_recipes_limit, stream_cart)
+from recipes.cache import ingredients_cache, tags_cache
+from recipes.models import CartIngredient, Ingredient, Recipe, Tag
+from recipes.pantry import ingredient_index
+from recipes.search import autocomplete
 from users.models import User
 
 
@@ -32,6 +44,7 @@ class UserViewSet(AddDeleteMixin, UserViewSetMixin):
     pagination_class = FoodgramPaginator
     filter_backends = (filters.SearchFilter, filters.OrderingFilter)
     search_fields = ('username',)
+    keyset_ordering = ('-id',)
 
     @action(methods=['get'], detail=False, url_path='me',
             permission_classes=[permissions.IsAuthenticated])
@@ -45,11 +58,18 @@ class UserViewSet(AddDeleteMixin, UserViewSetMixin):
             permission_classes=[permissions.IsAuthenticated])
     def user_subscriptions(self, request):
         """Получение списка авторов на которых подписан пользователь."""
-        user = request.user
-        following = user.follower.all()
+        recipes_limit = get_recipes_limit(request)
+        following = self.paginate_queryset(
+            request.user.follower.select_related('author')
+        )
+        recipes = defaultdict(list)
+        for recipe in Recipe.objects.latest_by_authors(
+            [follow.author_id for follow in following], recipes_limit
+        ):
+            recipes[recipe.author_id].append(recipe)
         serializer = FollowSerializer(
-            self.paginate_queryset(following), many=True,
-            context={'request': request}
+            following, many=True,
+            context={'request': request, 'recipes': recipes}
         )
         return self.get_paginated_response(serializer.data)
 
@@ -107,7 +127,7 @@ def login(request):
         get_user_model(),
         email=serializer.validated_data.get('email')
     )
-    if not user.check_password(serializer.validated_data.get('password')):
+    if not verify_password(user, serializer.validated_data.get('password')):
         return Response('Пароль неверный', status=status.HTTP_400_BAD_REQUEST)
     token, _ = Token.objects.get_or_create(user=user)
     return Response({'auth_token': str(token)}, status=status.HTTP_201_CREATED)
@@ -124,27 +144,38 @@ def logout(request):
         return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(AnonymousCacheMixin, ReferenceDataMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """
     ViewSet для обработки запросов к Тегам:
     получение тегов или их списка. Только для чтения.
     """
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
+    reference = tags_cache
+    cache_scope = 'tags'
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(AnonymousCacheMixin, ReferenceDataMixin,
+                         viewsets.ReadOnlyModelViewSet):
     """
     ViewSet для обработки запросов к ингредиентам:
     получение ингредиента или их списка. Только для чтения.
+    Параметр ?name= дает подсказки: сначала совпадения по началу
+    названия, затем по вхождению.
     """
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
-    filter_backends = (NameSearchFilter,)
-    search_fields = ('^name',)
+    reference = ingredients_cache
+    cache_scope = 'ingredients'
+
+    def get_reference_list(self):
+        query = self.request.query_params.get('name', '').strip()
+        return autocomplete(query) if query else super().get_reference_list()
 
 
-class RecipeViewSet(AddDeleteMixin, viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousCacheMixin, AddDeleteMixin,
+                    viewsets.ModelViewSet):
     """
     ViewSet для обработки запросов к рецептам:
     получение рецепта или списка, их добавление или удаление
@@ -154,9 +185,29 @@ class RecipeViewSet(AddDeleteMixin, viewsets.ModelViewSet):
     lookup_field = 'id'
     permission_classes = [IsAuthorOrReadOnly]
     pagination_class = FoodgramPaginator
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, RecipeSearchFilter,
+                       RecipeOrderingFilter)
     filterset_class = RecipeFilter
-    ordering_fields = ('-pub_date',)
+    ordering_fields = ('pub_date', 'favorites_count')
+    ordering = ('-pub_date', '-id')
+    keyset_ordering = ('-pub_date', '-id')
+    cache_scope = 'recipes'
+
+    def get_queryset(self):
+        if self.action == 'list':
+            return Recipe.objects.for_cards(self.request.user)
+        if self.request.method in permissions.SAFE_METHODS:
+            return Recipe.objects.for_view(self.request.user)
+        return self.queryset
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        users = list(instance.cart.values_list('user', flat=True))
+        instance.delete()
+        CartIngredient.objects.rebuild(users)
+        User.objects.filter(id=instance.author_id).update(
+            recipes_count=Greatest(F('recipes_count') - 1, 0)
+        )
 
     def get_serializer_class(self):
         return (RecipeViewSerializer
@@ -175,21 +226,86 @@ class RecipeViewSet(AddDeleteMixin, viewsets.ModelViewSet):
 
     @action(methods=['post'], detail=True, url_path='shopping_cart',
             permission_classes=[permissions.IsAuthenticated])
+    @transaction.atomic
     def user_cart(self, request, id):
         """Функция добавления и удаления в корзину"""
-        return self.add_bound(id, 'cart', ShortRecipe)
+        response = self.add_bound(id, 'cart', ShortRecipe)
+        if response.status_code == status.HTTP_201_CREATED:
+            CartIngredient.objects.add_recipe(request.user, id)
+        return response
 
     @user_cart.mapping.delete
+    @transaction.atomic
     def delete_cart(self, request, id):
-        return self.delete_bound(id, 'cart')
+        self.delete_bound(id, 'cart')
+        CartIngredient.objects.remove_recipe(request.user, id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(methods=['get'], detail=False, url_path='download_shopping_cart',
+    @action(methods=['get'], detail=False, url_path='feed',
             permission_classes=[permissions.IsAuthenticated])
+    def user_feed(self, request):
+        """
+        Лента рецептов авторов, на которых подписан пользователь,
+        от новых к старым. Пагинация по ключу, первая страница кэшируется.
+        """
+        paginator = KeysetPaginator()
+        cache_key = None
+        if (settings.FEED_CACHE_TIMEOUT
+                and paginator.cursor_query_param not in request.query_params):
+            cache_key = head_page_key(
+                request.user.id, paginator.get_page_size(request)
+            )
+            data = cache.get(cache_key)
+            if data is not None:
+                return Response(data)
+        recipes = paginator.paginate_queryset(
+            Recipe.objects.for_cards(request.user)
+            .filter(author__following__user=request.user),
+            request, self
+        )
+        response = paginator.get_paginated_response(
+            self.get_serializer(recipes, many=True).data
+        )
+        if cache_key:
+            cache.set(cache_key, response.data, settings.FEED_CACHE_TIMEOUT)
+        return response
+
+    @action(methods=['get'], detail=False, url_path='cook')
+    def user_cook(self, request):
+        """
+        Рецепты, которые можно приготовить из имеющихся ингредиентов:
+        ?ingredients=1,2,3 -- по убыванию доли имеющихся ингредиентов.
+        """
+        ingredient_ids = get_ingredient_ids(request)
+        limit = min(
+            get_positive_int(request, 'limit') or settings.COOK_RESULTS_LIMIT,
+            settings.COOK_RESULTS_LIMIT
+        )
+        ranking = ingredient_index.coverage(ingredient_ids, limit)
+        recipes = Recipe.objects.for_view(request.user).in_bulk(
+            [recipe_id for recipe_id, _, _ in ranking]
+        )
+        data = []
+        for recipe_id, coverage, matched in ranking:
+            if recipe_id not in recipes:
+                continue
+            item = self.get_serializer(recipes[recipe_id]).data
+            item['coverage'] = round(coverage, 2)
+            item['matched'] = matched
+            data.append(item)
+        return Response(data)
+
+    @action(methods=['get'], detail=False, url_path='download_shopping_cart',
+            permission_classes=[permissions.IsAuthenticated],
+            content_negotiation_class=IgnoreFormatNegotiation)
     def user_cart_download(self, request):
-        """Функция скачивания списка покупок"""
-        cart = (RecipeIngredient.objects
-                .filter(recipe__cart__user=request.user)
+        """
+        Функция скачивания списка покупок.
+        Формат задается параметром ?format=txt|csv, по умолчанию txt.
+        """
+        cart = (CartIngredient.objects
+                .filter(user=request.user)
                 .order_by('ingredient__name')
-                .values('ingredient__name', 'ingredient__measurement_unit')
-                .annotate(amount=Sum('amount')))
-        return text_cart(cart)
+                .values('ingredient__name', 'ingredient__measurement_unit',
+                        'amount'))
+        return stream_cart(cart, request.query_params.get('format', 'txt'))
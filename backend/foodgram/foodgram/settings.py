@@ -76,6 +76,27 @@ DATABASES = {
     }
 }
 
+# Кэш должен быть общим для процессов. Журнал изменений индекса
+# ингредиентов (recipes/pantry.py) ведется, только если incr бэкенда
+# атомарен (memcached, redis); с файловым кэшем индекс
+# перестраивается целиком после каждого изменения рецептов.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': ('django.contrib.auth.password_validation'
@@ -124,7 +145,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [('django_filters.rest_framework'
                                  '.DjangoFilterBackend')],
@@ -145,3 +166,38 @@ TAG_LENGTH, SLUG_LENGTH = 70, 70
 HEX_LENGTH = 7
 
 PAGE_LMT = 10
+
+PAGE_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGE_COUNT_CACHE_TIMEOUT', 0))
+
+ANON_CACHE_TIMEOUT = int(os.getenv('ANON_CACHE_TIMEOUT', 60))
+
+# Ограничения проверки паролей на процесс. Их сумма должна быть
+# меньше числа потоков воркера gunicorn (GUNICORN_THREADS),
+# иначе лишние входы не получат отказ.
+LOGIN_WORKERS = int(os.getenv('LOGIN_WORKERS', 2))
+
+LOGIN_QUEUE = int(os.getenv('LOGIN_QUEUE', 4))
+
+AUTH_TOKEN_CACHE_SIZE = 1024
+
+AUTH_TOKEN_LOCAL_TIMEOUT = 30
+
+AUTH_TOKEN_CACHE_TIMEOUT = 5 * 60
+
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+
+AUTOCOMPLETE_LIMIT = 50
+
+COOK_RESULTS_LIMIT = 20
+
+IMAGE_VARIANTS = {'small': 320, 'medium': 960}
+
+IMAGE_WORKERS = 2
+
+FEED_CACHE_TIMEOUT = 60
+
+RECIPE_CARD_CACHE_TIMEOUT = 60 * 60
+
+POPULARITY_HALF_LIFE_DAYS = 7
+
+POPULARITY_WEIGHTS = {'favorite': 2, 'cart': 1}
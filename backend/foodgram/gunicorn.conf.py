@@ -0,0 +1,13 @@
+import os
+
+bind = '0:8000'
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    # Запросы обрабатываются параллельно в потоках воркера,
+    # поэтому ограничение входов в api/passwords.py срабатывает.
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', 16))
@@ -1,8 +1,8 @@
 from django.conf import settings
 from django.contrib import admin
 
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+from .models import (CartIngredient, Favorite, Ingredient, Recipe,
+                     RecipeIngredient, ShoppingCart, Tag)
 
 admin.site.empty_value_display = '-пусто-'
 
@@ -36,7 +36,7 @@ class RecipeAdmin(admin.ModelAdmin):
         ])
 
     def favorite_count(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
     favorite_count.short_description = 'Добавлено в избранное'
     ingredient_list.short_description = 'Ингредиенты'
@@ -87,9 +87,20 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_per_page = settings.PAGE_LMT
 
 
+class CartIngredientAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'ingredient',
+        'amount'
+    )
+    search_fields = ('user__username', 'ingredient__name')
+    list_per_page = settings.PAGE_LMT
+
+
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
+admin.site.register(CartIngredient, CartIngredientAdmin)
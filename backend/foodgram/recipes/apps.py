@@ -1,6 +1,30 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from .cache import ingredients_cache, tags_cache
+        from .images import recipe_deleted
+        from .models import Ingredient, Recipe, Tag
+        from .pantry import ingredient_index
+        from .popularity import SOURCES, add_event, remove_event
+        from .search import (create_fulltext_index, create_trigram_index,
+                             update_search_vector)
+
+        post_migrate.connect(create_trigram_index, sender=self)
+        post_migrate.connect(create_fulltext_index, sender=self)
+        post_save.connect(update_search_vector, sender=Recipe)
+        post_delete.connect(recipe_deleted, sender=Recipe)
+        post_save.connect(ingredient_index.recipe_changed, sender=Recipe)
+        post_delete.connect(ingredient_index.recipe_changed, sender=Recipe)
+        for model, reference in ((Tag, tags_cache),
+                                 (Ingredient, ingredients_cache)):
+            post_save.connect(reference.invalidate, sender=model)
+            post_delete.connect(reference.invalidate, sender=model)
+        for model in SOURCES:
+            post_save.connect(add_event, sender=model)
+            post_delete.connect(remove_event, sender=model)
@@ -0,0 +1,60 @@
+from threading import Lock
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Ingredient, Tag
+
+
+class ReferenceCache:
+    """
+    Справочные данные модели в памяти процесса.
+    Актуальность проверяется по общей версии в кэше Django,
+    которую меняет любое сохранение или удаление объекта модели
+после фиксации транзакции.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f'reference:{model._meta.label_lower}'
+        self._version = None
+        self._items = None
+        self._lock = Lock()
+
+    def __deepcopy__(self, memo):
+        # Поля DRF копируют свои аргументы, а кэш должен быть общим.
+        return self
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is not None:
+            return version
+        cache.add(self.version_key, uuid4().hex, timeout=None)
+        return cache.get(self.version_key)
+
+    def invalidate(self, **kwargs):
+        """
+        Меняет версию после фиксации транзакции, иначе другой процесс
+        успел бы загрузить старые данные под новой версией.
+        """
+        transaction.on_commit(
+            lambda: cache.set(self.version_key, uuid4().hex, timeout=None)
+        )
+
+    def get(self):
+        """Объекты модели по id в порядке сортировки модели."""
+        version = self.version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._items = self.load()
+                    self._version = version
+        return self._items
+
+    def load(self):
+        return {obj.id: obj for obj in self.model.objects.all()}
+
+
+tags_cache = ReferenceCache(Tag)
+ingredients_cache = ReferenceCache(Ingredient)
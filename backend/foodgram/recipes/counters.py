@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Follow, User
+from .models import Favorite, Recipe
+
+
+def count_of(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на объект."""
+    return Coalesce(Subquery(
+        model.objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+@transaction.atomic
+def reconcile():
+    """
+    Приводит счетчики рецептов, подписчиков и избранного
+    к фактическим данным. Возвращает число исправленных
+    рецептов и пользователей.
+    """
+    recipes = Recipe.objects.annotate(
+        actual=count_of(Favorite, 'recipe')
+    ).exclude(favorites_count=F('actual')).count()
+    Recipe.objects.update(favorites_count=count_of(Favorite, 'recipe'))
+    users = User.objects.annotate(
+        actual_recipes=count_of(Recipe, 'author'),
+        actual_followers=count_of(Follow, 'author'),
+    ).exclude(
+        recipes_count=F('actual_recipes'),
+        followers_count=F('actual_followers'),
+    ).count()
+    User.objects.update(
+        recipes_count=count_of(Recipe, 'author'),
+        followers_count=count_of(Follow, 'author'),
+    )
+    return recipes, users
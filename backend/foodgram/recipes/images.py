@@ -0,0 +1,92 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='recipe-images'
+)
+
+
+def variant_name(image_name, variant):
+    """Путь уменьшенной копии картинки в хранилище."""
+    path = PurePosixPath(image_name)
+    return str(path.parent / 'variants' / f'{path.stem}_{variant}.webp')
+
+
+def make_variants(recipe_id, image_name):
+    """
+    Создает уменьшенные копии картинки рецепта в WebP
+    и сохраняет их пути в рецепте, если картинка не сменилась.
+    """
+    variants = {}
+    try:
+        with default_storage.open(image_name) as file:
+            with Image.open(file) as image:
+                image.load()
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA')
+                for variant, size in settings.IMAGE_VARIANTS.items():
+                    copy = image.copy()
+                    copy.thumbnail((size, size))
+                    content = ContentFile(b'')
+                    copy.save(content, 'WEBP', quality=80)
+                    name = variant_name(image_name, variant)
+                    if default_storage.exists(name):
+                        default_storage.delete(name)
+                    variants[variant] = default_storage.save(name, content)
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', image_name)
+        return
+    if not Recipe.objects.filter(id=recipe_id, image=image_name).update(
+        image_variants=variants, updated=timezone.now()
+    ):
+        # Картинку успели заменить или рецепт удалили.
+        remove_variants(variants)
+
+
+def remove_variants(variants):
+    """Удаляет файлы уменьшенных копий из хранилища."""
+    for name in variants.values():
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.exception('Не удалось удалить файл %s', name)
+
+
+def discard_variants(variants):
+    """Удаляет файлы уменьшенных копий после коммита."""
+    if variants:
+        variants = dict(variants)
+        transaction.on_commit(lambda: remove_variants(variants))
+
+
+def recipe_deleted(sender, instance, **kwargs):
+    """Рецепт удален -- удаляются и уменьшенные копии его картинки."""
+    discard_variants(instance.image_variants)
+
+
+def _make_variants_in_worker(recipe_id, image_name):
+    try:
+        make_variants(recipe_id, image_name)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(recipe):
+    """Ставит обработку картинки рецепта в очередь после коммита."""
+    if recipe.image:
+        transaction.on_commit(lambda: executor.submit(
+            _make_variants_in_worker, recipe.id, recipe.image.name
+        ))
@@ -1,37 +1,127 @@
+import gzip
 from csv import DictReader
+from itertools import islice
+from json import JSONDecodeError, JSONDecoder
+from time import monotonic
+
 from django.conf import settings
-from json import load
+from django.db import transaction
 
+from api.caching import bump
+from recipes.cache import ingredients_cache
 from recipes.models import Ingredient, Tag
 
 DATA_DIR = 'recipes/static/data/' if settings.DEBUG else 'static/data/'
 
+BATCH_SIZE = 5000
+
+CHUNK_SIZE = 64 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_data(path):
+    """Открывает файл данных, прозрачно распаковывая gzip."""
+    with open(path, 'rb') as file:
+        compressed = file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
 
-def load_ingredients():
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """
+    Читает JSON-массив из файла по частям и отдает его элементы
+    по одному, не загружая документ в память целиком.
+    """
+    decoder = JSONDecoder()
+    buffer, pos = '', 0
+    started = eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('Файл должен содержать JSON-массив')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Число может продолжаться в следующей части файла,
+                # поэтому элемент отдается только после разделителя.
+                if eof or (end < len(buffer)
+                           and buffer[end] in ' \t\r\n,]'):
+                    pos = end
+                    yield item
+                    continue
+        elif eof:
+            raise ValueError('Неожиданный конец JSON-массива')
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def bulk_load_ingredients(rows, batch_size=BATCH_SIZE):
+    """
+    Загружает ингредиенты пачками в одной транзакции.
+    Повторы внутри файла отбрасываются в памяти,
+    уже существующие в базе -- пропускаются при вставке.
+    """
+    rows = iter(rows)
+    seen = set()
+    total = 0
+    start = monotonic()
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            total += len(chunk)
+            batch = []
+            for row in chunk:
+                key = (row['name'], row['measurement_unit'])
+                if key in seen:
+                    continue
+                seen.add(key)
+                batch.append(Ingredient(
+                    name=row['name'],
+                    measurement_unit=row['measurement_unit']
+                ))
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        # bulk_create не отправляет сигналы, поэтому справочник
+        # и кэш ответов сбрасываются вручную.
+        ingredients_cache.invalidate()
+        transaction.on_commit(lambda: bump('ingredients'))
+    elapsed = monotonic() - start
+    print(f'{total} rows in {elapsed:.2f}s'
+          f' ({total / elapsed if elapsed else total:.0f} rows/s)')
+    return total
+
+
+def load_ingredients(path=f'{DATA_DIR}ingredients.csv'):
     """Загружает данные из файла ingredients.csv."""
     print('loading ingredients data...')
-    with open(f'{DATA_DIR}ingredients.csv', encoding='utf-8') as file:
-        data = DictReader(
+    with open_data(path) as file:
+        bulk_load_ingredients(DictReader(
             file, fieldnames=['name', 'measurement_unit'], delimiter=','
-            )
-        for row in data:
-            Ingredient.objects.get_or_create(
-                name=row['name'],
-                measurement_unit=row['measurement_unit']
-            )
+        ))
     print('ingredient data loaded!')
 
 
-def load_ingredients_json():
+def load_ingredients_json(path=f'{DATA_DIR}ingredients.json'):
     """Загружает данные из файла ingredients.json."""
     print('loading ingredients data...')
-    with open(f'{DATA_DIR}ingredients.json', encoding='utf-8') as file:
-        for row in load(file):
-            Ingredient.objects.get_or_create(
-                name=row['name'],
-                measurement_unit=row['measurement_unit']
-            )
-    print('user data loaded!')
+    with open_data(path) as file:
+        bulk_load_ingredients(iter_json_array(file))
+    print('ingredient data loaded!')
 
 
 def load_base_tags():
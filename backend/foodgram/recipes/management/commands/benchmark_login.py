@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from django.contrib.auth.hashers import (check_password, get_hashers,
+                                         make_password)
+from django.core.management.base import BaseCommand
+
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    """Создает комманду для django,
+    предназначенную для замера скорости проверки паролей
+    каждым алгоритмом из PASSWORD_HASHERS.
+    Для запуска - python manage.py benchmark_login --count 50 --threads 4.
+    """
+
+    help = 'Замеряет число входов в секунду на ядро и в пуле потоков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=50)
+        parser.add_argument('--threads', type=int, default=4)
+
+    def handle(self, *args, **options):
+        count, threads = options['count'], options['threads']
+        for hasher in get_hashers():
+            try:
+                encoded = make_password(PASSWORD, hasher=hasher.algorithm)
+            except ValueError as error:
+                print(f'{hasher.algorithm}: пропущен ({error})')
+                continue
+            start = perf_counter()
+            for _ in range(count):
+                check_password(PASSWORD, encoded)
+            serial = count / (perf_counter() - start)
+            start = perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                list(pool.map(
+                    lambda _: check_password(PASSWORD, encoded), range(count)
+                ))
+            parallel = count / (perf_counter() - start)
+            print(f'{hasher.algorithm}: {serial:.1f} входов/с на ядро, '
+                  f'{parallel:.1f} входов/с в {threads} потоках')
@@ -0,0 +1,50 @@
+from itertools import combinations
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Создает комманду для django,
+    предназначенную для вывода планов запросов списка рецептов
+    при всех сочетаниях фильтров.
+    Для запуска - python manage.py explain_recipe_filters.
+    """
+
+    help = 'Выводит EXPLAIN запроса списка рецептов для всех фильтров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Выполнить запросы (EXPLAIN ANALYZE на PostgreSQL)'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(cart__isnull=False).first()
+        tag = Tag.objects.first()
+        if user is None or tag is None:
+            print('no data to explain: python manage.py seed_recipes')
+            return
+        request = RequestFactory().get('/api/recipes/')
+        request.user = user
+        params = {
+            'tags': [tag.slug],
+            'author': user.id,
+            'is_favorited': 1,
+            'is_in_shopping_cart': 1,
+        }
+        explain = {'analyze': True} if options['analyze'] else {}
+        for size in range(len(params) + 1):
+            for names in combinations(params, size):
+                queryset = RecipeFilter(
+                    {name: params[name] for name in names},
+                    queryset=Recipe.objects.with_user_flags(user),
+                    request=request
+                ).qs
+                print(f'--- {", ".join(names) or "no filters"}')
+                print(queryset[:options['limit']].explain(**explain))
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 
-from ._load_data_funcs import load_base_tags, load_ingredients
+from ._load_data_funcs import DATA_DIR, load_base_tags, load_ingredients
 
 
 class Command(BaseCommand):
@@ -13,9 +13,15 @@ class Command(BaseCommand):
     help = ('Загружает данные из csv файлов в',
             '"recipes/static/data/" в соответствующие модели')
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=f'{DATA_DIR}ingredients.csv',
+            help='Путь к csv файлу с ингредиентами (в том числе сжатому gzip)'
+        )
+
     def handle(self, *args, **options):
         try:
-            load_ingredients()
+            load_ingredients(options['path'])
             load_base_tags()
         except Exception as error:
             print(error)
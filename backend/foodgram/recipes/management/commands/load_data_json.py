@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 
-from ._load_data_funcs import load_ingredients_json
+from ._load_data_funcs import DATA_DIR, load_ingredients_json
 
 
 class Command(BaseCommand):
@@ -13,8 +13,14 @@ class Command(BaseCommand):
     help = ('Загружает данные из json файлов в',
             '"recipes/static/data/" в соответствующие модели')
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=f'{DATA_DIR}ingredients.json',
+            help='Путь к json файлу с ингредиентами (в том числе сжатому gzip)'
+        )
+
     def handle(self, *args, **options):
         try:
-            load_ingredients_json()
+            load_ingredients_json(options['path'])
         except Exception as error:
             print(error)
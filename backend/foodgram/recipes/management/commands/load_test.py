@@ -0,0 +1,82 @@
+import asyncio
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+
+async def fetch(url, slow):
+    """Один GET-запрос; медленный клиент отправляет заголовки по частям."""
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, parts.port or 80
+    )
+    request = (f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+               'Connection: close\r\n\r\n').encode()
+    try:
+        if slow:
+            writer.write(request[:len(request) // 2])
+            await writer.drain()
+            await asyncio.sleep(slow)
+            request = request[len(request) // 2:]
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+    finally:
+        writer.close()
+    return int(status_line.split()[1])
+
+
+async def run(url, total, concurrency, slow):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = perf_counter()
+            try:
+                status = await fetch(url, slow)
+            except (OSError, IndexError, ValueError):
+                status = None
+            if status != 200:
+                errors += 1
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return perf_counter() - start, sorted(latencies), errors
+
+
+class Command(BaseCommand):
+    """Создает комманду для django,
+    предназначенную для нагрузочного сравнения режимов сервера.
+    Сервер запускается в каждом режиме по очереди:
+    SERVER_MODE=wsgi gunicorn и SERVER_MODE=asgi gunicorn,
+    после чего для каждого выполняется
+    python manage.py load_test --url http://127.0.0.1:8000/api/tags/
+    --requests 2000 --concurrency 200 --slow 0.5.
+    """
+
+    help = 'Нагружает адрес параллельными, в том числе медленными, клиентами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url',
+                            default='http://127.0.0.1:8000/api/tags/')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--slow', type=float, default=0.0)
+
+    def handle(self, *args, **options):
+        elapsed, latencies, errors = asyncio.run(run(
+            options['url'], options['requests'],
+            options['concurrency'], options['slow']
+        ))
+        count = len(latencies)
+        print(f'{count} запросов за {elapsed:.2f} с: '
+              f'{count / elapsed:.1f} запросов/с, '
+              f'p50 {latencies[count // 2] * 1000:.0f} мс, '
+              f'p99 {latencies[int(count * 0.99)] * 1000:.0f} мс, '
+              f'ошибок {errors}')
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.images import make_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Создает комманду для django,
+    предназначенную для создания недостающих уменьшенных копий
+    картинок рецептов.
+    Для запуска - python manage.py make_image_variants.
+    """
+
+    help = 'Создает недостающие уменьшенные копии картинок рецептов'
+
+    def handle(self, *args, **options):
+        print('making image variants...')
+        recipes = (Recipe.objects
+                   .exclude(image='')
+                   .only('id', 'image', 'image_variants'))
+        for recipe in recipes.iterator():
+            if recipe.image_variants.keys() != settings.IMAGE_VARIANTS.keys():
+                make_variants(recipe.id, recipe.image.name)
+        print('image variants made!')
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import CartIngredient
+
+
+class Command(BaseCommand):
+    """Создает комманду для django,
+    предназначенную для пересчета итогов корзин покупок.
+    Для запуска - python manage.py rebuild_cart [--verify].
+    """
+
+    help = ('Пересчитывает итоги корзин покупок пользователей, '
+            'с --verify только сверяет их с содержимым корзин')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить итоги, не изменяя их'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            print('rebuilding cart totals...')
+            CartIngredient.objects.rebuild()
+            print('cart totals rebuilt!')
+            return
+        expected = {
+            (row['recipe__cart__user'], row['ingredient']): row['total']
+            for row in CartIngredient.objects.calculate().iterator()
+        }
+        stored = {
+            (user, ingredient): amount
+            for user, ingredient, amount
+            in CartIngredient.objects.values_list(
+                'user', 'ingredient', 'amount').iterator()
+        }
+        users = sorted({
+            user for user, ingredient in expected.keys() | stored.keys()
+            if expected.get((user, ingredient))
+            != stored.get((user, ingredient))
+        })
+        if users:
+            print(f'cart totals differ for users: {users}')
+        else:
+            print('cart totals are consistent!')
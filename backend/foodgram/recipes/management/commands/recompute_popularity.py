@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.popularity import recompute
+
+
+class Command(BaseCommand):
+    """Создает комманду для django,
+    предназначенную для полного пересчета рейтинга популярности
+    рецептов. Запускается периодически, например из cron.
+    Для запуска - python manage.py recompute_popularity.
+    """
+
+    help = 'Пересчитывает рейтинг популярности рецептов'
+
+    def handle(self, *args, **options):
+        print('recomputing popularity...')
+        print(f'popularity recomputed for {recompute()} recipes!')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import reconcile
+
+
+class Command(BaseCommand):
+    """Создает комманду для django,
+    предназначенную для сверки счетчиков рецептов, подписчиков
+    и избранного с фактическими данными.
+    Для запуска - python manage.py reconcile_counters.
+    """
+
+    help = 'Пересчитывает счетчики рецептов, подписчиков и избранного'
+
+    def handle(self, *args, **options):
+        print('reconciling counters...')
+        recipes, users = reconcile()
+        print(f'recipes fixed: {recipes}')
+        print(f'users fixed: {users}')
+        print('counters reconciled!')
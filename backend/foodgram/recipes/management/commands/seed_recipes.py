@@ -0,0 +1,100 @@
+from itertools import islice
+from random import Random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import popularity
+from recipes.counters import reconcile
+from recipes.models import (CartIngredient, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.search import backfill_search_vectors
+from users.models import User
+
+BATCH_SIZE = 10000
+
+
+def batches(objects, size=BATCH_SIZE):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    """Создает комманду для django,
+    предназначенную для заполнения базы тестовыми рецептами
+    для замеров производительности.
+    Для запуска - python manage.py seed_recipes --recipes 1000000.
+    """
+
+    help = 'Заполняет базу тестовыми пользователями и рецептами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        random = Random(options['seed'])
+        tags = list(Tag.objects.values_list('id', flat=True))
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        if not tags or not ingredients:
+            print('load tags and ingredients first: '
+                  'python manage.py load_data')
+            return
+        print('seeding users...')
+        first_user = User.objects.count()
+        for batch in batches(
+            User(username=f'seed{first_user + n}',
+                 email=f'seed{first_user + n}@seed.local',
+                 first_name='Seed', last_name='User')
+            for n in range(options['users'])
+        ):
+            User.objects.bulk_create(batch)
+        users = list(User.objects.values_list('id', flat=True))
+        print('seeding recipes...')
+        last_recipe = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        for batch in batches(
+            Recipe(name=f'Рецепт {n}', text='Тестовый рецепт',
+                   cooking_time=random.randint(1, 180),
+                   author_id=random.choice(users))
+            for n in range(options['recipes'])
+        ):
+            Recipe.objects.bulk_create(batch)
+        recipes = list(Recipe.objects.filter(id__gt=last_recipe)
+                       .values_list('id', flat=True))
+        print('seeding relations...')
+        through = Recipe.tags.through
+        for batch in batches(
+            through(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in random.sample(tags, random.randint(1, len(tags)))
+        ):
+            through.objects.bulk_create(batch)
+        for batch in batches(
+            RecipeIngredient(recipe_id=recipe, ingredient_id=ingredient,
+                             amount=random.randint(1, 500))
+            for recipe in recipes
+            for ingredient in random.sample(ingredients, 5)
+        ):
+            RecipeIngredient.objects.bulk_create(batch)
+        for model in (Favorite, ShoppingCart):
+            for batch in batches(
+                model(user_id=random.choice(users), recipe_id=recipe)
+                for recipe in recipes
+                if random.random() < 0.3
+            ):
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+        # bulk_create не отправляет сигналы: производные данные
+        # пересчитываются, чтобы база была как после работы API.
+        print('rebuilding derived data...')
+        CartIngredient.objects.rebuild()
+        reconcile()
+        popularity.recompute()
+        backfill_search_vectors()
+        print(f'seeded {len(recipes)} recipes!')
@@ -1,9 +1,12 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxLengthValidator, MinValueValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import models, transaction
+from django.db.models import (Exists, OuterRef, Prefetch, Q, Sum,
+                              UniqueConstraint)
+from django.utils import timezone
 
-from users.models import User
+from users.models import Follow, User
 from .validators import validate_hex
 
 
@@ -63,6 +66,99 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def with_user_flags(self, user):
+        """
+        Отмечает для всей выборки одним запросом нахождение рецептов
+        в избранном и корзине пользователя.
+        """
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False)
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+        )
+
+    def for_view(self, user):
+        """
+        Выборка для полного представления рецептов: автор с подпиской,
+        теги и ингредиенты подгружаются постоянным числом запросов
+        независимо от размера страницы.
+        """
+        authors = User.objects.only(
+            'id', 'email', 'username', 'first_name', 'last_name'
+        )
+        authors = (
+            authors.annotate(is_subscribed=models.Value(False))
+            if user.is_anonymous
+            else authors.annotate(is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('pk'))))
+        )
+        return (
+            self.only('id', 'name', 'image', 'image_variants', 'text',
+                      'cooking_time', 'author', 'pub_date', 'updated')
+            .prefetch_related(
+                Prefetch('author', queryset=authors),
+                'tags',
+                Prefetch(
+                    'recipe_ingredient',
+                    queryset=RecipeIngredient.objects.select_related(
+                        'ingredient')
+                ),
+            )
+            .with_user_flags(user)
+        )
+
+    def for_cards(self, user):
+        """
+        Выборка для списка карточек рецептов: только поля, нужные
+        для ключа кэша карточки, и флаги пользователя.
+        """
+        subscribed = (
+            models.Value(False) if user.is_anonymous
+            else Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author')))
+        )
+        return (
+            self.only('id', 'author', 'pub_date', 'updated')
+            .annotate(is_subscribed=subscribed)
+            .with_user_flags(user)
+        )
+
+    def latest_by_authors(self, author_ids, limit=None):
+        """
+        Последние рецепты авторов одним запросом: не более limit
+        на каждого автора (ROW_NUMBER в разрезе автора).
+        """
+        if not author_ids or limit is None:
+            return self.filter(author_id__in=author_ids).only(
+                'id', 'name', 'image', 'image_variants', 'cooking_time',
+                'author'
+            )
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        return self.raw(
+            'SELECT id, name, image, image_variants, cooking_time, author_id'
+            ' FROM ('
+            '  SELECT id, name, image, image_variants, cooking_time,'
+            '    author_id,'
+            '    ROW_NUMBER() OVER ('
+            '      PARTITION BY author_id ORDER BY pub_date DESC'
+            '    ) AS position'
+            f'  FROM {self.model._meta.db_table}'
+            f'  WHERE author_id IN ({placeholders})'
+            ') AS ranked WHERE position <= %s '
+            'ORDER BY author_id, position',
+            [*author_ids, limit]
+        )
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
     name = models.CharField(
@@ -81,6 +177,12 @@ class Recipe(models.Model):
         blank=True,
         help_text='Загрузите изображение',
     )
+    image_variants = models.JSONField(
+        'Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         'Описание',
         help_text='Описание приготовления',
@@ -111,11 +213,41 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлено в избранное',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date', )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date'),
+                name='recipe_favorites_count_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -171,6 +303,11 @@ class FavoriteAndCart(models.Model):
         verbose_name='Рецепт',
         on_delete=models.CASCADE
     )
+    added = models.DateTimeField(
+        'Дата добавления',
+        default=timezone.now,
+        editable=False
+    )
 
     class Meta:
         abstract = True
@@ -210,3 +347,130 @@ class ShoppingCart(FavoriteAndCart):
 
     def __str__(self):
         return f'{self.user.username} добавил в корзину {self.recipe.name}'
+
+
+class CartIngredientQuerySet(models.QuerySet):
+    """
+    Поддержка итогов корзины: при добавлении и удалении рецепта
+    меняются только строки его ингредиентов.
+    """
+
+    def _apply_recipe(self, user, recipe_id, sign):
+        amounts = dict(
+            RecipeIngredient.objects
+            .filter(recipe_id=recipe_id)
+            .values_list('ingredient_id', 'amount')
+        )
+        with transaction.atomic():
+            totals = {
+                total.ingredient_id: total
+                for total in self.select_for_update().filter(
+                    user=user, ingredient_id__in=amounts)
+            }
+            new_totals, changed, empty = [], [], []
+            for ingredient_id, amount in amounts.items():
+                total = totals.get(ingredient_id)
+                if total is None:
+                    if sign > 0:
+                        new_totals.append(self.model(
+                            user=user, ingredient_id=ingredient_id,
+                            amount=amount
+                        ))
+                    continue
+                total.amount += sign * amount
+                (changed if total.amount > 0 else empty).append(total)
+            self.bulk_create(new_totals)
+            self.bulk_update(changed, ('amount',))
+            self.filter(pk__in=[total.pk for total in empty]).delete()
+
+    def add_recipe(self, user, recipe_id):
+        """Добавляет ингредиенты рецепта в итоги корзины."""
+        self._apply_recipe(user, recipe_id, 1)
+
+    def remove_recipe(self, user, recipe_id):
+        """Вычитает ингредиенты рецепта из итогов корзины."""
+        self._apply_recipe(user, recipe_id, -1)
+
+    @staticmethod
+    def calculate(users=None):
+        """Итоги корзин, посчитанные заново по рецептам в корзинах."""
+        # Условие на пользователя должно стоять в том же filter(),
+        # иначе корзины присоединятся дважды и суммы умножатся.
+        condition = (Q(recipe__cart__isnull=False) if users is None
+                     else Q(recipe__cart__user__in=users))
+        return (RecipeIngredient.objects.filter(condition)
+                .values('recipe__cart__user', 'ingredient')
+                .annotate(total=Sum('amount'))
+                .order_by())
+
+    def rebuild(self, users=None):
+        """Пересчитывает итоги корзин указанных (или всех) пользователей."""
+        with transaction.atomic():
+            (self.all() if users is None
+             else self.filter(user__in=users)).delete()
+            self.bulk_create(
+                (self.model(
+                    user_id=row['recipe__cart__user'],
+                    ingredient_id=row['ingredient'],
+                    amount=row['total']
+                ) for row in self.calculate(users).iterator()),
+                batch_size=1000
+            )
+
+
+class CartIngredient(models.Model):
+    """
+    Итоговое количество ингредиента в корзине пользователя.
+    Поддерживается при изменении корзины и состава рецептов,
+    чтобы выгрузка списка покупок не требовала агрегации.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='cart_totals'
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = CartIngredientQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзинах'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='Итог ингредиента в корзине один на пользователя'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} -- {self.amount}'
+
+
+class RecipePopularity(models.Model):
+    """
+    Рейтинг популярности рецепта: log2 взвешенной суммы добавлений
+    в избранное и корзину с затуханием по времени.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity'
+    )
+    score = models.FloatField('Рейтинг', default=0, db_index=True)
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+
+    def __str__(self):
+        return f'{self.recipe}: {self.score}'
@@ -0,0 +1,167 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from heapq import nlargest
+from threading import Lock
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.base import BaseCache
+from django.db import transaction
+
+from .models import RecipeIngredient
+
+VERSION_KEY = 'ingredient-index:version'
+
+CHANGES_TIMEOUT = 24 * 60 * 60
+
+MAX_CHANGES = 1000
+
+
+def change_key(version):
+    return f'ingredient-index:change:{version}'
+
+
+def atomic_incr():
+    """
+    incr атомарен между процессами, только если бэкенд
+    его переопределяет (memcached, redis). У файлового кэша и кэша
+    в базе это get и set, и два процесса могут получить один номер.
+    """
+    return type(caches[DEFAULT_CACHE_ALIAS]).incr is not BaseCache.incr
+
+
+class IngredientIndex:
+    """
+    Обратный индекс: id ингредиента -> отсортированный массив id рецептов.
+    Хранится в памяти процесса. Изменения рецептов записываются в журнал
+    в кэше Django, и каждый процесс применяет их к своему индексу,
+    обновляя только строки измененных рецептов.
+    Журнал ведется только с кэшем, где incr атомарен; с другими
+    бэкендами индекс перестраивается целиком при любом изменении.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._postings = {}
+        self._recipes = {}
+        self._lock = Lock()
+
+    def version(self):
+        version = cache.get(VERSION_KEY)
+        if version is not None:
+            return version
+        cache.add(VERSION_KEY, 0, timeout=None)
+        return cache.get(VERSION_KEY)
+
+    def recipe_changed(self, sender, instance, **kwargs):
+        """Записывает изменение рецепта в журнал после коммита."""
+        recipe_id = instance.id
+        transaction.on_commit(lambda: self.publish(recipe_id))
+
+    def publish(self, recipe_id):
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            self.version()
+            version = cache.incr(VERSION_KEY)
+        if atomic_incr():
+            cache.set(change_key(version), recipe_id, CHANGES_TIMEOUT)
+
+    def load(self):
+        postings = defaultdict(list)
+        recipes = defaultdict(list)
+        rows = RecipeIngredient.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id')
+        for ingredient_id, recipe_id in rows.iterator():
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        self._postings = {
+            ingredient_id: array('q', ids)
+            for ingredient_id, ids in postings.items()
+        }
+        self._recipes = {
+            recipe_id: array('q', sorted(ids))
+            for recipe_id, ids in recipes.items()
+        }
+
+    def apply(self, recipe_ids):
+        """
+        Обновляет записи только переданных рецептов. Массивы
+        не меняются на месте, а заменяются новыми, чтобы параллельное
+        чтение видело либо старую, либо новую версию.
+        """
+        current = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'):
+            current[recipe_id].add(ingredient_id)
+        for recipe_id in recipe_ids:
+            old = set(self._recipes.get(recipe_id, ()))
+            new = current[recipe_id]
+            for ingredient_id in old - new:
+                recipes = self._postings[ingredient_id]
+                position = bisect_left(recipes, recipe_id)
+                self._postings[ingredient_id] = (
+                    recipes[:position] + recipes[position + 1:]
+                )
+            for ingredient_id in new - old:
+                recipes = self._postings.get(ingredient_id, array('q'))
+                position = bisect_left(recipes, recipe_id)
+                self._postings[ingredient_id] = (
+                    recipes[:position] + array('q', [recipe_id])
+                    + recipes[position:]
+                )
+            if new:
+                self._recipes[recipe_id] = array('q', sorted(new))
+            else:
+                self._recipes.pop(recipe_id, None)
+
+    def sync(self):
+        """Догоняет журнал изменений или перестраивает индекс целиком."""
+        version = self.version()
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version == version:
+                return
+            if (self._version is None or not atomic_incr()
+                    or version < self._version
+                    or version - self._version > MAX_CHANGES):
+                self.load()
+            else:
+                keys = [change_key(number)
+                        for number in range(self._version + 1, version + 1)]
+                changes = cache.get_many(keys)
+                if len(changes) < len(keys):
+                    self.load()
+                else:
+                    self.apply(set(changes.values()))
+            self._version = version
+
+    def coverage(self, ingredient_ids, limit):
+        """
+        Лучшие рецепты по доле имеющихся ингредиентов.
+        Возвращает кортежи (id рецепта, доля, число совпавших ингредиентов).
+        """
+        self.sync()
+        postings, recipes = self._postings, self._recipes
+        matched = Counter()
+        for ingredient_id in ingredient_ids:
+            matched.update(postings.get(ingredient_id, ()))
+        sizes = {
+            recipe_id: len(recipes.get(recipe_id, ())) or count
+            for recipe_id, count in matched.items()
+        }
+        best = nlargest(
+            limit,
+            matched.items(),
+            key=lambda item: (item[1] / sizes[item[0]], item[1], item[0])
+        )
+        return [
+            (recipe_id, count / sizes[recipe_id], count)
+            for recipe_id, count in best
+        ]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,84 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from functools import reduce
+from math import log2
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Favorite, RecipePopularity, ShoppingCart
+
+# Вес события растет как 2 ** (t / период полураспада) от этой даты:
+# так старые события относительно «затухают», а рейтинг меняется
+# только при новых событиях, без пересчета всех рецептов.
+# Сам вес быстро выходит за пределы float, поэтому рейтинг хранится
+# как log2 суммы весов, а веса складываются в логарифмах.
+EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+# Разница логарифмов, при которой от суммы ничего не осталось.
+EMPTY_DELTA = 1e-9
+
+SOURCES = {Favorite: 'favorite', ShoppingCart: 'cart'}
+
+
+def event_weight(kind, moment):
+    """log2 вклада события в рейтинг с учетом его времени."""
+    half_lives = ((moment - EPOCH).total_seconds()
+                  / (settings.POPULARITY_HALF_LIFE_DAYS * 24 * 60 * 60))
+    return log2(settings.POPULARITY_WEIGHTS[kind]) + half_lives
+
+
+def log_add(first, second):
+    """log2(2 ** first + 2 ** second) без переполнения."""
+    high, low = max(first, second), min(first, second)
+    return high + log2(1 + 2 ** (low - high))
+
+
+def add_event(sender, instance, created=False, **kwargs):
+    """Учитывает добавление рецепта в избранное или корзину."""
+    if not created:
+        return
+    weight = event_weight(SOURCES[sender], instance.added)
+    with transaction.atomic():
+        popularity, created = (
+            RecipePopularity.objects.select_for_update().get_or_create(
+                recipe_id=instance.recipe_id, defaults={'score': weight}
+            )
+        )
+        if not created:
+            popularity.score = log_add(popularity.score, weight)
+            popularity.save(update_fields=('score',))
+
+
+def remove_event(sender, instance, **kwargs):
+    """Убирает из рейтинга вклад удаленного события."""
+    weight = event_weight(SOURCES[sender], instance.added)
+    with transaction.atomic():
+        popularity = RecipePopularity.objects.select_for_update().filter(
+            recipe_id=instance.recipe_id
+        ).first()
+        if popularity is None:
+            return
+        if popularity.score - weight < EMPTY_DELTA:
+            popularity.delete()
+            return
+        popularity.score += log2(1 - 2 ** (weight - popularity.score))
+        popularity.save(update_fields=('score',))
+
+
+@transaction.atomic
+def recompute():
+    """Пересчитывает рейтинг всех рецептов по избранному и корзинам."""
+    weights = defaultdict(list)
+    for model, kind in SOURCES.items():
+        for recipe_id, added in (model.objects
+                                 .values_list('recipe_id', 'added')
+                                 .iterator()):
+            weights[recipe_id].append(event_weight(kind, added))
+    RecipePopularity.objects.all().delete()
+    RecipePopularity.objects.bulk_create(
+        (RecipePopularity(recipe_id=recipe_id, score=reduce(log_add, scores))
+         for recipe_id, scores in weights.items()),
+        batch_size=10000
+    )
+    return len(weights)
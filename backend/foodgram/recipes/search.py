@@ -0,0 +1,190 @@
+import re
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, connections
+from django.db.models import (Case, F, FloatField, IntegerField, Q, Value,
+                              When)
+from django.db.models.expressions import RawSQL
+
+from .cache import ingredients_cache
+from .models import Ingredient, Recipe
+
+TRIGRAM_INDEX = 'recipes_ingredient_name_trgm'
+
+SEARCH_INDEX = 'recipes_recipe_search_idx'
+
+SEARCH_CONFIG = 'russian'
+
+SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+)
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def create_trigram_index(sender, using='default', **kwargs):
+    """
+    Создает GIN-индекс pg_trgm по названию ингредиента.
+    Выражение индекса совпадает с тем, во что Django превращает
+    name__icontains и name__istartswith на PostgreSQL.
+    """
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+    with db.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} '
+            f'ON {Ingredient._meta.db_table} '
+            'USING gin (UPPER(name::text) gin_trgm_ops)'
+        )
+
+
+def create_fulltext_index(sender, using='default', **kwargs):
+    """
+    Готовит полнотекстовый поиск рецептов: на PostgreSQL -- GIN-индекс
+    по search_vector, на SQLite -- таблицу FTS5 с триггерами.
+    """
+    db = connections[using]
+    table = Recipe._meta.db_table
+    with db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} '
+                f'ON {table} USING gin (search_vector)'
+            )
+            backfill_search_vectors(using)
+        elif db.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f"USING fts5(name, text, content='{table}', "
+                "content_rowid='id')"
+            )
+            insert = (f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+                      'VALUES (new.id, new.name, new.text);')
+            delete = (f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, '
+                      "text) VALUES ('delete', old.id, old.name, old.text);")
+            for name, event, body in (
+                ('insert', 'INSERT', insert),
+                ('delete', 'DELETE', delete),
+                ('update', 'UPDATE OF name, text', delete + insert),
+            ):
+                cursor.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{name} '
+                    f'AFTER {event} ON {table} BEGIN {body} END'
+                )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+            )
+
+
+def backfill_search_vectors(using='default'):
+    """Заполняет поисковый вектор рецептов, созданных без сигналов."""
+    if connections[using].vendor == 'postgresql':
+        Recipe.objects.using(using).filter(
+            search_vector__isnull=True
+        ).update(search_vector=SEARCH_VECTOR)
+
+
+def update_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Обновляет поисковый вектор рецепта после сохранения."""
+    if connection.vendor != 'postgresql':
+        return
+    if update_fields and not {'name', 'text'} & set(update_fields):
+        return
+    Recipe.objects.filter(pk=instance.pk).update(search_vector=SEARCH_VECTOR)
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под поисковый запрос, по убыванию релевантности."""
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date', '-id')
+    if connection.vendor != 'sqlite':
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+    words = re.findall(r'\w+', query)
+    if not words:
+        return queryset.none()
+    match = ' '.join(f'"{word}"*' for word in words)
+    table = Recipe._meta.db_table
+    # Веса колонок повторяют веса A/B в SEARCH_VECTOR: название важнее.
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,)
+    )).annotate(rank=RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id',
+        (match,), output_field=FloatField()
+    )).order_by('-rank', '-pub_date', '-id')
+
+
+class PrefixIndex:
+    """
+    Отсортированный список названий ингредиентов в памяти процесса.
+    Совпадения по началу названия ищутся бинарным поиском,
+    по вхождению -- просмотром списка.
+    """
+
+    def __init__(self):
+        self._source = None
+        self._entries = None
+        self._lock = Lock()
+
+    def _load(self):
+        items = ingredients_cache.get()
+        if self._source is not items:
+            with self._lock:
+                if self._source is not items:
+                    self._entries = sorted(
+                        (ingredient.name.lower(), id)
+                        for id, ingredient in items.items()
+                    )
+                    self._source = items
+        return self._entries
+
+    def search(self, query, limit):
+        entries = self._load()
+        query = query.lower()
+        found = []
+        for position in range(bisect_left(entries, (query,)),
+                              len(entries)):
+            name, id = entries[position]
+            if len(found) == limit or not name.startswith(query):
+                break
+            found.append(id)
+        prefixed = set(found)
+        for name, id in entries:
+            if len(found) == limit:
+                break
+            if query in name and id not in prefixed:
+                found.append(id)
+        return found
+
+
+prefix_index = PrefixIndex()
+
+
+def autocomplete(query, limit=settings.AUTOCOMPLETE_LIMIT):
+    """
+    Ингредиенты, название которых содержит query: сначала совпадения
+    по началу названия, затем остальные, не более limit.
+    """
+    if connection.vendor == 'postgresql':
+        return list(Ingredient.objects.filter(name__icontains=query).annotate(
+            rank=Case(
+                When(name__istartswith=query, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('rank', 'name')[:limit])
+    ingredients = ingredients_cache.get()
+    return [ingredients[id] for id in prefix_index.search(query, limit)]
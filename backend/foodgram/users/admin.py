@@ -20,10 +20,10 @@ class UserAdmin(UserAdmin):
         return obj.get_full_name() or 'Безымянный'
 
     def followers(self, obj,):
-        return obj.following.count()
+        return obj.followers_count
 
     def recipe_count(self, obj,):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     full_name.short_description = 'Полное имя'
     followers.short_description = 'Подписчиков'